@@ -2,3 +2,17 @@ from psu364x.base import Psu
 from psu364x.base import Params
 from psu364x.base import Info
 from psu364x.base import UnexpectedResponse
+
+from psu364x.rollup import Rollup
+from psu364x.rollup import MemorySink
+
+from psu364x.regulator import Regulator
+
+from psu364x.transport import SerialTransport
+from psu364x.transport import TcpTransport
+from psu364x.transport import LoopbackTransport
+from psu364x.emulator import Emulator
+
+from psu364x.exporter import Exporter
+
+from psu364x.logger import Logger
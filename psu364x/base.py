@@ -21,6 +21,9 @@ import serial
 import re
 import warnings
 import struct
+import array
+
+from psu364x.transport import createTransport
 
 
 #=========================================================================================
@@ -47,7 +50,7 @@ class Psu:
     
     
     #----------------------------------------------------------------------------
-    def __init__(self, port=None, address=1, baudrate=38400, debug=False):
+    def __init__(self, port=None, address=1, baudrate=38400, debug=False, transport=None):
         """
         The port is immediately opened on object creation, when a port is given. It is not 
         opened when port is None and a successive call to open() will be needed
@@ -57,9 +60,15 @@ class Psu:
             - address : Address of the PSU (0-254, default: 1)
             - baud : Baud rate (default: 38400)
             - debug : If True, print command and response frame data
+            - transport : psu364x.transport.Transport object used to exchange frames
+                          with the PSU (default: TCP transport when port starts with
+                          "tcp://", serial port otherwise)
             
         """    
-        self.sio = serial.Serial(timeout=2)
+        if transport is None:
+            transport = createTransport(port, timeout=2)
+        
+        self.sio = transport
         self.port = port
         self.baudrate = baudrate
         self.debug = debug
@@ -75,7 +84,7 @@ class Psu:
     #----------------------------------------------------------------------------
     def open(self):
         """
-        Open the serial port and test the communication with the PSU
+        Open the transport (serial port by default) and test the communication with the PSU
         
         Keyword arguments:
             None
@@ -206,21 +215,8 @@ class Psu:
         if data is None:
             return None
         
-        params = Params()
-        params.measureCurrent = float(struct.unpack_from('<H', data, 3)[0]) / 1000
-        params.measureVoltage = float(struct.unpack_from('<L', data, 5)[0]) / 1000
-        params.measurePower = float(struct.unpack_from('<H', data, 9)[0]) / 100
-        params.maxCurrent = float(struct.unpack_from('<H', data, 11)[0]) / 1000
-        params.maxVoltage = float(struct.unpack_from('<L', data, 13)[0]) / 1000
-        params.maxPower = float(struct.unpack_from('<H', data, 17)[0]) / 100
-        params.voltageSet = float(struct.unpack_from('<L', data, 19)[0]) / 1000
-        
-        
-        params.outputState = (ord(data[23]) & 0x01 == 0x01)
-        params.excessiveCurrent = (ord(data[23]) & 0x02 == 0x02)
-        params.excessivePower = (ord(data[23]) & 0x04 == 0x04)
-        
-        return params
+        ## Fields are decoded from the frame on first access ##
+        return Params(data)
     
     
     #----------------------------------------------------------------------------
@@ -238,11 +234,12 @@ class Psu:
         if not self.remote:
             warnings.warn("The PSU needs to be in remote control mode (PC) to set operating parameters.")
         
+        ## Rounded, so the values read with getParameters() are written back unchanged ##
         data = struct.pack('<HIHIB',
-            int(params.maxCurrent * 1000),      ## unsigned word, offset: 0
-            int(params.maxVoltage * 1000),      ## unsigned long, offset: 2
-            int(params.maxPower * 100),         ## unsigned word, offset: 6
-            int(params.voltageSet * 1000),      ## unsigned long, offset: 8
+            int(round(params.maxCurrent * 1000)),   ## unsigned word, offset: 0
+            int(round(params.maxVoltage * 1000)),   ## unsigned long, offset: 2
+            int(round(params.maxPower * 100)),      ## unsigned word, offset: 6
+            int(round(params.voltageSet * 1000)),   ## unsigned long, offset: 8
             self.address                        ## unsigned byte, offset: 12
         )
 
@@ -526,9 +523,7 @@ class Psu:
             True if successful, False otherwise
         """
         
-        self.remote = True
-        
-        return self.send(self.COMMAND_CONTROLSTATE, [0x03 if state else 0x02]) is not None
+        return self.setControlState(True, state)
     
     
     #----------------------------------------------------------------------------
@@ -577,10 +572,26 @@ class Psu:
         if params is None:
             return False
         
+        return self.setControlState(remote, params.outputState)
+    
+    
+    #----------------------------------------------------------------------------
+    def setControlState(self, remote, output):
+        """
+        Sets both the remote control and the output state with a single command
+        
+        Keyword arguments:
+            - remote : True: PC control (remote), False: Local control
+            - output : True=ON, False=OFF
+        
+        Return:
+            True if successful, False otherwise
+        """
+        
         self.remote = remote
         
         state = 0x02 if remote else 0x00
-        state = state | (0x01 if params.outputState else 0x00)
+        state = state | (0x01 if output else 0x00)
         
         return self.send(self.COMMAND_CONTROLSTATE, [state]) is not None
     
@@ -601,12 +612,177 @@ class Psu:
         if data is None:
             return None
         
-        info = Info()
-        info.serial = data[3:9]
-        info.model = data[9:14]
-        info.version = float(struct.unpack_from('<H', data, 14)[0]) / 100
+        return Info(data)
+
+
+
+#=========================================================================================
+#
+# Frame fields
+#
+#=========================================================================================
+_UNSET = object()
+
+_WORD = struct.Struct('<H')
+_LONG = struct.Struct('<L')
+
+_READ = struct.Struct('<HLHHLHLB')      # Data of the READ response, at offset 3 #
+_READINFO = struct.Struct('<6s5sH')     # Data of the READINFO response, at offset 3 #
+
+
+class _Field(object):
+    """
+    Descriptor of a field decoded from the response frame on first access. The decoded
+    (or assigned) value is cached in the _values list of the instance.
+    """
+    
+    __slots__ = ('index', 'decode', 'default', 'readOnly')
+    
+    #----------------------------------------------------------------------------
+    def __init__(self, index, decode, default, readOnly=False):
+        """
+        Keyword arguments:
+            - index : Index of the field in the _values list of the instance
+            - decode : Callable returning the value of the field from the frame
+            - default : Value of the field when the instance has no frame
+            - readOnly : If True, the field can not be assigned (default: False)
+        """
+        
+        self.index = index
+        self.decode = decode
+        self.default = default
+        self.readOnly = readOnly
+    
+    
+    #----------------------------------------------------------------------------
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
         
-        return info
+        value = obj._values[self.index]
+        if value is _UNSET:
+            value = self.default if obj._data is None else self.decode(obj._data)
+            obj._values[self.index] = value
+        
+        return value
+    
+    
+    #----------------------------------------------------------------------------
+    def __set__(self, obj, value):
+        if self.readOnly:
+            raise AttributeError("can't set attribute")
+        
+        obj._values[self.index] = value
+
+
+
+#=========================================================================================
+#
+# Frame
+#
+#=========================================================================================
+class _Frame(object):
+    """
+    Base class of the objects built from a response frame (26 bytes). Fields are only
+    decoded when accessed.
+    """
+    
+    __slots__ = ('_data', '_values')
+    
+    FIELDS = ()
+    
+    #----------------------------------------------------------------------------
+    def __init__(self, data=None):
+        """
+        Keyword arguments:
+            - data : Response frame received from the PSU. When None, all the fields
+                     have their default value.
+        """
+        
+        self._data = data
+        self._values = [_UNSET] * len(self.FIELDS)
+    
+    
+    #----------------------------------------------------------------------------
+    def toTuple(self):
+        """
+        Returns the value of the fields, in the order of FIELDS
+        
+        Keyword arguments:
+            None
+        
+        Return:
+            Tuple containing the value of the fields
+        """
+        
+        values = self._values
+        if _UNSET in values:
+            self._decode()
+            values = self._values
+        
+        return tuple(values)
+    
+    
+    #----------------------------------------------------------------------------
+    def _decode(self):
+        """
+        Decode all the fields not decoded (or assigned) yet
+        """
+        
+        if self._data is None:
+            cls = type(self)
+            decoded = [getattr(cls, name).default for name in self.FIELDS]
+        else:
+            decoded = self._decodeFrame(self._data)
+        
+        self._values = [d if v is _UNSET else v for v, d in zip(self._values, decoded)]
+    
+    
+    #----------------------------------------------------------------------------
+    def _decodeFrame(self, data):
+        """
+        Decode all the fields from the frame, in the order of FIELDS. Subclasses
+        override it to unpack the frame at once.
+        """
+        
+        cls = type(self)
+        return [getattr(cls, name).decode(data) for name in self.FIELDS]
+    
+    
+    #----------------------------------------------------------------------------
+    def __reduce__(self):
+        ## Used by copy and pickle : the frame, plus the fields decoded or assigned ##
+        state = dict((index, value) for index, value in enumerate(self._values)
+            if value is not _UNSET)
+        
+        return (type(self), (self._data,), state or None)
+    
+    
+    #----------------------------------------------------------------------------
+    def __setstate__(self, state):
+        for index, value in state.items():
+            self._values[index] = value
+    
+    
+    #----------------------------------------------------------------------------
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        
+        return self.toTuple() == other.toTuple()
+    
+    
+    #----------------------------------------------------------------------------
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        
+        return not result
+    
+    
+    ## Mutable, not hashable. Use toTuple() as a key ##
+    __hash__ = None
 
 
 
@@ -615,14 +791,33 @@ class Psu:
 # Info
 #
 #=========================================================================================
-class Info:
+class Info(_Frame):
     """
-    Holds the informations received from the PSU with the command READINFO (0x8C)
+    Holds the informations received from the PSU with the command READINFO (0x8C).
+    The fields are read-only, so the object is hashable.
     """
     
-    serial = ""         # Serial number (6 bytes) #
-    model = ""          # Model number (5 bytes) #
-    version = 0.0       # Firmware version number #
+    __slots__ = ()
+    
+    FIELDS = ('serial', 'model', 'version')
+    
+    serial = _Field(0, lambda data: data[3:9], "", True)                                  # Serial number (6 bytes) #
+    model = _Field(1, lambda data: data[9:14], "", True)                                  # Model number (5 bytes) #
+    version = _Field(2, lambda data: float(_WORD.unpack_from(data, 14)[0]) / 100, 0.0, True)  # Firmware version number #
+    
+    #----------------------------------------------------------------------------
+    def _decodeFrame(self, data):
+        serial, model, version = _READINFO.unpack_from(data, 3)
+        
+        return (serial, model, float(version) / 100)
+    
+    #----------------------------------------------------------------------------
+    def __hash__(self):
+        if self._data is None:
+            return hash(self.toTuple())
+        
+        ## The fields are decoded from these bytes only, no need to decode them ##
+        return hash(self._data[3:16])
 
     #----------------------------------------------------------------------------
     def __str__(self):
@@ -646,7 +841,7 @@ class Info:
 # Params
 #
 #=========================================================================================
-class Params:
+class Params(_Frame):
     """
     Holds the operating parameters received from the PSU using getParameters()
     
@@ -654,17 +849,50 @@ class Params:
     are used
     """
     
-    maxVoltage = 0.0            # Maximum allowable voltage #
-    maxCurrent = 0.0            # Maximum allowable current #
-    maxPower = 0.0              # Maximum allowable power #
-    voltageSet = 0.0            # Current set voltage #
-    measureVoltage = 0.0        # Actual voltage measurement (V) from the output #
-    measureCurrent = 0.0        # Actual current measurement (A) from the output #
-    measurePower = 0.0          # Actual power measurement (W) from the output #
-        
-    outputState = False         # Output active: True=ON, False=OFF
-    excessiveCurrent = False    # Excessive current flag
-    excessivePower = False      # Excessive power flag
+    __slots__ = ()
+    
+    FIELDS = ('maxVoltage', 'maxCurrent', 'maxPower', 'voltageSet', 'measureVoltage',
+              'measureCurrent', 'measurePower', 'outputState', 'excessiveCurrent',
+              'excessivePower')
+    
+    maxVoltage = _Field(0, lambda data: float(_LONG.unpack_from(data, 13)[0]) / 1000, 0.0)      # Maximum allowable voltage #
+    maxCurrent = _Field(1, lambda data: float(_WORD.unpack_from(data, 11)[0]) / 1000, 0.0)      # Maximum allowable current #
+    maxPower = _Field(2, lambda data: float(_WORD.unpack_from(data, 17)[0]) / 100, 0.0)         # Maximum allowable power #
+    voltageSet = _Field(3, lambda data: float(_LONG.unpack_from(data, 19)[0]) / 1000, 0.0)      # Current set voltage #
+    measureVoltage = _Field(4, lambda data: float(_LONG.unpack_from(data, 5)[0]) / 1000, 0.0)   # Actual voltage measurement (V) from the output #
+    measureCurrent = _Field(5, lambda data: float(_WORD.unpack_from(data, 3)[0]) / 1000, 0.0)   # Actual current measurement (A) from the output #
+    measurePower = _Field(6, lambda data: float(_WORD.unpack_from(data, 9)[0]) / 100, 0.0)      # Actual power measurement (W) from the output #
+        
+    outputState = _Field(7, lambda data: ord(data[23]) & 0x01 == 0x01, False)       # Output active: True=ON, False=OFF
+    excessiveCurrent = _Field(8, lambda data: ord(data[23]) & 0x02 == 0x02, False)  # Excessive current flag
+    excessivePower = _Field(9, lambda data: ord(data[23]) & 0x04 == 0x04, False)    # Excessive power flag
+    
+    
+    #----------------------------------------------------------------------------
+    def _decodeFrame(self, data):
+        (measureCurrent, measureVoltage, measurePower, maxCurrent, maxVoltage, maxPower,
+            voltageSet, flags) = _READ.unpack_from(data, 3)
+        
+        return (float(maxVoltage) / 1000, float(maxCurrent) / 1000, float(maxPower) / 100,
+                float(voltageSet) / 1000, float(measureVoltage) / 1000,
+                float(measureCurrent) / 1000, float(measurePower) / 100,
+                flags & 0x01 == 0x01, flags & 0x02 == 0x02, flags & 0x04 == 0x04)
+    
+    
+    #----------------------------------------------------------------------------
+    def toArray(self):
+        """
+        Returns the value of the fields as an array of doubles, in the order of FIELDS.
+        Flags are converted to 0.0 or 1.0
+        
+        Keyword arguments:
+            None
+        
+        Return:
+            array.array object
+        """
+        
+        return array.array('d', self.toTuple())
     
     
     #----------------------------------------------------------------------------
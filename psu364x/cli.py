@@ -0,0 +1,74 @@
+"""
+Helpers shared by the command line tools of the psu364x package
+"""
+
+#=========================================================================================
+from psu364x.base import Psu
+from psu364x.base import UnexpectedResponse
+from psu364x.transport import createTransport
+
+
+#=========================================================================================
+def parseDevice(spec):
+    """
+    Parse a device specification of the form PORT[@ADDRESS], e.g. /dev/ttyUSB0@1
+    or tcp://rack1:4001@3
+
+    Keyword arguments:
+        - spec : Device specification
+
+    Return:
+        (port, address) tuple, address is None when not specified
+
+    Raise:
+        ValueError : In case the address is not valid
+    """
+
+    port, sep, address = spec.rpartition("@")
+    if not sep:
+        return (spec, None)
+
+    if not address.isdigit() or int(address) > 254:
+        raise ValueError("Invalid PSU address: {0}".format(address))
+
+    return (port, int(address))
+
+
+#=========================================================================================
+def connect(port, address=0, baudrate=9600, debug=False, identify=True):
+    """
+    Create a psu364x.Psu object for the given port and address and open it
+
+    Keyword arguments:
+        - port : Serial port or "tcp://host:port"
+        - address : Address of the PSU (0-254, default: 0)
+        - baudrate : Baud rate (default: 9600)
+        - debug : If True, print command and response frame data
+        - identify : If True, read the PSU informations to test the communication
+                     (default: True)
+
+    Return:
+        psu364x.Psu object
+
+    Raise:
+        SerialException : In case the port can not be opened
+        UnexpectedResponse : In case the PSU does not respond
+    """
+
+    psu = Psu(None, baudrate=baudrate, debug=debug, transport=createTransport(port))
+    psu.port = port
+    psu.address = address
+
+    if not identify:
+        psu.sio.port = port
+        psu.sio.baudrate = baudrate
+        psu.sio.open()
+        psu.sio.flushInput()
+
+        return psu
+
+    if not psu.open():
+        psu.sio.close()
+        raise UnexpectedResponse("The PSU at {0}@{1} did not identify".format(port, address))
+
+    return psu
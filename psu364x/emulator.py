@@ -0,0 +1,160 @@
+"""
+This module provides a minimal emulation of a 364x series PSU, to be used with
+psu364x.transport.LoopbackTransport for testing without hardware
+
+    psu = psu364x.Psu(transport=LoopbackTransport(Emulator()))
+    psu.open()
+
+The output is loaded by a resistor. The output voltage is the set voltage, reduced
+when needed to stay within the maximum current and power parameters.
+"""
+
+#=========================================================================================
+import struct
+
+from psu364x.base import Psu
+
+
+#=========================================================================================
+#
+# Emulator
+#
+#=========================================================================================
+class Emulator:
+    """
+    Emulates the remote control protocol of a 364x series PSU
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, address=None, load=10.0, serial="000001", model="3645A", version=1.0):
+        """
+        Keyword arguments:
+            - address : Address the emulated PSU answers to (default: any)
+            - load : Resistance of the load on the output (ohms, default: 10)
+            - serial : Serial number (6 characters)
+            - model : Model number (5 characters)
+            - version : Firmware version number
+        """
+
+        self.address = address
+        self.load = load
+        self.serial = serial
+        self.model = model
+        self.version = version
+
+        self.maxCurrent = 3.0
+        self.maxVoltage = 36.0
+        self.maxPower = 100.0
+        self.voltageSet = 0.0
+        self.outputState = False
+        self.remote = False
+
+        self.frames = 0
+
+
+    #----------------------------------------------------------------------------
+    def __call__(self, frame):
+        """
+        Process a command frame
+
+        Keyword arguments:
+            - frame : Command frame (26 bytes)
+
+        Return:
+            Response frame, None if the frame is not addressed to this PSU
+        """
+
+        if len(frame) != 26 or ord(frame[0]) != 0xAA:
+            return None
+
+        if ord(frame[25]) != sum(ord(c) for c in frame[:25]) % 256:
+            return self._build(ord(frame[1]), Psu.COMMAND_CHECK, chr(Psu.RESULT_ERROR))
+
+        address = ord(frame[1])
+        command = ord(frame[2])
+
+        if self.address is not None and address != self.address:
+            return None
+
+        self.frames += 1
+
+        if command == Psu.COMMAND_READ:
+            voltage, current, power = self.measure()
+
+            flags = (0x01 if self.outputState else 0x00)
+            flags |= (0x02 if current >= self.maxCurrent and self.outputState else 0x00)
+            flags |= (0x04 if power >= self.maxPower and self.outputState else 0x00)
+
+            data = struct.pack('<HLHHLHLB',
+                int(round(current * 1000)),
+                int(round(voltage * 1000)),
+                int(round(power * 100)),
+                int(round(self.maxCurrent * 1000)),
+                int(round(self.maxVoltage * 1000)),
+                int(round(self.maxPower * 100)),
+                int(round(self.voltageSet * 1000)),
+                flags)
+
+            return self._build(address, command, data)
+
+        if command == Psu.COMMAND_SET:
+            maxCurrent, maxVoltage, maxPower, voltageSet = struct.unpack_from('<HIHI', frame, 3)
+
+            self.maxCurrent = float(maxCurrent) / 1000
+            self.maxVoltage = float(maxVoltage) / 1000
+            self.maxPower = float(maxPower) / 100
+            self.voltageSet = min(float(voltageSet) / 1000, self.maxVoltage)
+
+            return self._build(address, Psu.COMMAND_CHECK, chr(Psu.RESULT_OK))
+
+        if command == Psu.COMMAND_CONTROLSTATE:
+            state = ord(frame[3])
+
+            self.remote = (state & 0x02 == 0x02)
+            self.outputState = (state & 0x01 == 0x01)
+
+            return self._build(address, Psu.COMMAND_CHECK, chr(Psu.RESULT_OK))
+
+        if command == Psu.COMMAND_READINFO:
+            data = struct.pack('<6s5sH', self.serial, self.model, int(round(self.version * 100)))
+
+            return self._build(address, command, data)
+
+        return self._build(address, Psu.COMMAND_CHECK, chr(Psu.RESULT_ERROR))
+
+
+    #----------------------------------------------------------------------------
+    def measure(self):
+        """
+        Compute the output measurements
+
+        Keyword arguments:
+            None
+
+        Return:
+            (voltage, current, power) tuple
+        """
+
+        if not self.outputState:
+            return (0.0, 0.0, 0.0)
+
+        voltage = self.voltageSet
+        if self.load > 0:
+            voltage = min(voltage, self.maxCurrent * self.load, (self.maxPower * self.load) ** 0.5)
+            current = voltage / self.load
+        else:
+            voltage = 0.0
+            current = self.maxCurrent
+
+        return (voltage, current, voltage * current)
+
+
+    #----------------------------------------------------------------------------
+    def _build(self, address, command, data):
+        """
+        Build a response frame, including the checksum
+        """
+
+        frame = struct.pack('<B B B 22s', 0xAA, address, command, data)
+
+        return frame + chr(sum(ord(c) for c in frame) % 256)
@@ -0,0 +1,429 @@
+"""
+This module provides a Prometheus exporter for 364x series PSU
+
+Each port is polled by its own thread on a fixed schedule, the PSU sharing a port
+one after the other. After each poll, the metrics of the device are rendered and
+stored as a snapshot. HTTP scrapes only join the latest snapshots, so they never
+touch the serial line and their frequency does not affect the polling.
+
+    exporter = psu364x.Exporter(("", 9364))
+    exporter.addDevice(psu, "bench1", interval=1.0)
+    exporter.start()
+
+Or from the command line :
+
+    psu364x-exporter --listen :9364 /dev/ttyUSB0@0 tcp://rack1:4001@1
+"""
+
+#=========================================================================================
+import sys
+import time
+import socket
+import argparse
+import threading
+import serial
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+from psu364x.base import UnexpectedResponse
+from psu364x.cli import parseDevice, connect
+
+
+#----------------------------------------------------------------------------
+# Metric families : (name, type, help, Params field or None for poll metrics)
+#----------------------------------------------------------------------------
+FAMILIES = (
+    ("psu364x_up", "gauge", "1 if the last poll of the PSU succeeded, 0 otherwise", None),
+    ("psu364x_voltage_volts", "gauge", "Measured output voltage", "measureVoltage"),
+    ("psu364x_current_amperes", "gauge", "Measured output current", "measureCurrent"),
+    ("psu364x_power_watts", "gauge", "Measured output power", "measurePower"),
+    ("psu364x_voltage_setpoint_volts", "gauge", "Voltage set point", "voltageSet"),
+    ("psu364x_voltage_limit_volts", "gauge", "Maximum voltage parameter", "maxVoltage"),
+    ("psu364x_current_limit_amperes", "gauge", "Maximum current parameter", "maxCurrent"),
+    ("psu364x_power_limit_watts", "gauge", "Maximum power parameter", "maxPower"),
+    ("psu364x_output_enabled", "gauge", "1 if the output is ON", "outputState"),
+    ("psu364x_excessive_current", "gauge", "1 if the excessive current flag is set", "excessiveCurrent"),
+    ("psu364x_excessive_power", "gauge", "1 if the excessive power flag is set", "excessivePower"),
+    ("psu364x_poll_duration_seconds", "gauge", "Duration of the last poll", None),
+    ("psu364x_last_poll_timestamp_seconds", "gauge", "Time of the last successful poll", None),
+    ("psu364x_polls_total", "counter", "Number of polls", None),
+    ("psu364x_poll_errors_total", "counter", "Number of failed polls", None),
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+
+#=========================================================================================
+#
+# Poller
+#
+#=========================================================================================
+class Poller(threading.Thread):
+    """
+    Polls the parameters of the PSU sharing a port, one after the other, on a fixed
+    schedule and keeps the metrics rendered from the last poll of each PSU
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, psu, addresses, names, interval=1.0):
+        """
+        Keyword arguments:
+            - psu : psu364x.Psu object, already opened. It must not be used by
+                    another thread while the poller is running.
+            - addresses : Addresses of the PSU to poll on this port
+            - names : Value of the "device" label of each PSU
+            - interval : Time between polls (s, default: 1)
+        """
+
+        threading.Thread.__init__(self, name="psu364x-poller-{0}".format(psu.port))
+        self.daemon = True
+
+        self.psu = psu
+        self.addresses = list(addresses)
+        self.names = list(names)
+        self.interval = interval
+
+        self.polls = dict((address, 0) for address in self.addresses)
+        self.errors = dict((address, 0) for address in self.addresses)
+        self.lastError = {}
+
+        self.labels = dict((address, '{{device="{0}"}}'.format(
+            name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")))
+            for address, name in zip(self.addresses, self.names))
+
+        self.stopEvent = threading.Event()
+
+        ## Address => {metric name => rendered sample line}, each replaced as a whole
+        ## after each poll ##
+        self.snapshots = dict((address, {}) for address in self.addresses)
+
+
+    #----------------------------------------------------------------------------
+    def poll(self, address):
+        """
+        Read the parameters of a PSU and update its snapshot
+
+        Keyword arguments:
+            - address : Address of the PSU
+
+        Return:
+            psu364x.Params object, None if the poll failed
+        """
+
+        self.psu.address = address
+        start = time.time()
+
+        try:
+            params = self.psu.getParameters()
+        except (UnexpectedResponse, serial.SerialException, socket.error) as e:
+            self.lastError[address] = str(e)
+            params = None
+        except Exception as e:
+            ## Any other error must not stop the thread, the PSU is reported down ##
+            self.lastError[address] = "{0}: {1}".format(type(e).__name__, str(e))
+            params = None
+
+        duration = time.time() - start
+
+        self.polls[address] += 1
+        if params is None:
+            self.errors[address] += 1
+
+        snapshot = {
+            "psu364x_up": 0 if params is None else 1,
+            "psu364x_poll_duration_seconds": duration,
+            "psu364x_polls_total": self.polls[address],
+            "psu364x_poll_errors_total": self.errors[address],
+        }
+
+        previous = self.snapshots[address]
+        if params is None:
+            ## Only keep the time of the last successful poll ##
+            if "psu364x_last_poll_timestamp_seconds" in previous:
+                snapshot["psu364x_last_poll_timestamp_seconds"] = None
+        else:
+            snapshot["psu364x_last_poll_timestamp_seconds"] = start
+
+            for name, kind, help, field in FAMILIES:
+                if field is not None:
+                    snapshot[name] = float(getattr(params, field))
+
+        lines = {}
+        for name, value in snapshot.items():
+            if value is None:
+                lines[name] = previous[name]
+            else:
+                lines[name] = "{0}{1} {2!r}\n".format(name, self.labels[address], float(value))
+
+        self.snapshots[address] = lines
+
+        return params
+
+
+    #----------------------------------------------------------------------------
+    def run(self):
+        deadline = time.time()
+
+        while not self.stopEvent.is_set():
+            for address in self.addresses:
+                self.poll(address)
+
+            deadline += self.interval
+            delay = deadline - time.time()
+
+            if delay < 0:
+                ## Polls took longer than the interval, restart the schedule from now ##
+                deadline = time.time()
+                delay = 0
+
+            self.stopEvent.wait(delay)
+
+
+    #----------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop the polling thread
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.stopEvent.set()
+
+
+
+#=========================================================================================
+#
+# Exporter
+#
+#=========================================================================================
+class Exporter:
+    """
+    Serves the metrics of the polled PSU over HTTP (Prometheus text format)
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, address=("", 9364)):
+        """
+        Keyword arguments:
+            - address : (host, port) the HTTP server listens on (default: port 9364
+                        on all interfaces)
+        """
+
+        self.address = address
+        self.pollers = []
+        self.server = None
+
+
+    #----------------------------------------------------------------------------
+    def addPort(self, psu, addresses, interval=1.0, names=None):
+        """
+        Add the PSU sharing a port. They are polled one after the other by a single
+        thread, which is started immediately if the exporter is already running.
+
+        Keyword arguments:
+            - psu : psu364x.Psu object, already opened
+            - addresses : Addresses of the PSU to poll on this port
+            - interval : Time between polls (s, default: 1)
+            - names : Value of the "device" label of each PSU (default: PORT@ADDRESS)
+
+        Return:
+            psu364x.exporter.Poller object
+        """
+
+        if names is None:
+            names = ["{0}@{1}".format(psu.port, address) for address in addresses]
+
+        poller = Poller(psu, addresses, names, interval)
+        self.pollers.append(poller)
+
+        if self.server is not None:
+            poller.start()
+
+        return poller
+
+
+    #----------------------------------------------------------------------------
+    def addDevice(self, psu, name=None, interval=1.0):
+        """
+        Add a single PSU to poll, at the current address of the psu364x.Psu object
+
+        Keyword arguments:
+            - psu : psu364x.Psu object, already opened
+            - name : Value of the "device" label (default: PORT@ADDRESS)
+            - interval : Time between polls (s, default: 1)
+
+        Return:
+            psu364x.exporter.Poller object
+        """
+
+        return self.addPort(psu, [psu.address], interval, None if name is None else [name])
+
+
+    #----------------------------------------------------------------------------
+    def render(self):
+        """
+        Returns the metrics of all the devices from their last snapshot
+
+        Keyword arguments:
+            None
+
+        Return:
+            Metrics in the Prometheus text format
+        """
+
+        snapshots = [poller.snapshots[address] for poller in self.pollers
+            for address in poller.addresses]
+        output = []
+
+        for name, kind, help, field in FAMILIES:
+            output.append("# HELP {0} {1}\n# TYPE {0} {2}\n".format(name, help, kind))
+
+            for snapshot in snapshots:
+                line = snapshot.get(name)
+                if line is not None:
+                    output.append(line)
+
+        return "".join(output)
+
+
+    #----------------------------------------------------------------------------
+    def start(self):
+        """
+        Start the pollers and the HTTP server, each on their own thread
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = exporter.render().encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _ThreadingHTTPServer(self.address, Handler)
+
+        for poller in self.pollers:
+            poller.start()
+
+        thread = threading.Thread(target=self.server.serve_forever, name="psu364x-exporter")
+        thread.daemon = True
+        thread.start()
+
+
+    #----------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop the HTTP server and the pollers
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+        for poller in self.pollers:
+            poller.stop()
+
+        for poller in self.pollers:
+            if poller.is_alive():
+                poller.join()
+
+
+
+#=========================================================================================
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+
+#=========================================================================================
+def main(argv=None):
+    """
+    Entry point of the psu364x-exporter command
+    """
+
+    parser = argparse.ArgumentParser(description="Prometheus exporter for Array 364x power supplies")
+    parser.add_argument("devices", metavar="PORT[@ADDRESS]", nargs="+",
+        help="Serial port or tcp://host:port of the PSU, optionally followed by its address")
+    parser.add_argument("-l", "--listen", default=":9364",
+        help="HOST:PORT the HTTP server listens on (default: :9364)")
+    parser.add_argument("-b", "--baudrate", type=int, default=9600,
+        help="Baud rate (default: 9600)")
+    parser.add_argument("-i", "--interval", type=float, default=1.0,
+        help="Time between polls in seconds (default: 1)")
+    args = parser.parse_args(argv)
+
+    host, sep, port = args.listen.rpartition(":")
+    if not sep or not port.isdigit():
+        parser.error("Invalid listen address: {0}".format(args.listen))
+
+    exporter = Exporter((host, int(port)))
+
+    try:
+        ports = {}
+        for spec in args.devices:
+            port, address = parseDevice(spec)
+            addresses = ports.setdefault(port, [])
+            if (address or 0) not in addresses:
+                addresses.append(address or 0)
+
+        ## A single poller per port, the PSU sharing a port can not be read concurrently ##
+        for port, addresses in ports.items():
+            psu = connect(port, addresses[0], args.baudrate)
+
+            exporter.addPort(psu, addresses, args.interval)
+
+    except (ValueError, UnexpectedResponse, serial.SerialException) as e:
+        parser.error(str(e))
+
+    exporter.start()
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+    exporter.stop()
+
+    return 0
+
+
+
+#=========================================================================================
+if __name__ == "__main__":
+    sys.exit(main())
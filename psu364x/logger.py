@@ -0,0 +1,675 @@
+"""
+This module provides high rate logging of the parameters of 364x series PSU to CSV
+or Parquet files
+
+Each port is polled by its own thread at a fixed rate (the PSU sharing a port are
+polled one after the other). Samples are queued and written in batches by a
+background thread, so disk latency never delays the next poll. The log files are
+rotated by size and/or time.
+
+    psu364x-log --rate 20 --output bench --rotate-time 3600 /dev/ttyUSB0@0 /dev/ttyUSB1@0
+
+Writing Parquet files requires pyarrow (pip install psu364x[parquet]).
+"""
+
+#=========================================================================================
+import os
+import sys
+import csv
+import time
+import signal
+import socket
+import argparse
+import threading
+import serial
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from psu364x.base import Params, UnexpectedResponse
+from psu364x.cli import parseDevice, connect
+
+
+#----------------------------------------------------------------------------
+# Columns of the log files
+#----------------------------------------------------------------------------
+COLUMNS = ("timestamp", "device") + Params.FIELDS
+
+FLAGS = ("outputState", "excessiveCurrent", "excessivePower")
+
+
+
+#=========================================================================================
+def _importPyarrow():
+    """
+    Import pyarrow, needed to write Parquet files
+
+    Raise:
+        ImportError : In case pyarrow is not installed
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow)")
+
+    return pyarrow
+
+
+
+#=========================================================================================
+#
+# CsvWriter
+#
+#=========================================================================================
+class CsvWriter:
+    """
+    Writes samples to a CSV file, through a large write buffer
+    """
+
+    EXTENSION = "csv"
+
+    #----------------------------------------------------------------------------
+    def __init__(self, path, bufferSize=1 << 20):
+        """
+        Keyword arguments:
+            - path : Path of the file to create
+            - bufferSize : Size of the write buffer (bytes, default: 1 MB)
+        """
+
+        self.path = path
+        self.file = open(path, "wb", bufferSize)
+        self.writer = csv.writer(self.file)
+
+        self.writer.writerow(COLUMNS)
+
+
+    #----------------------------------------------------------------------------
+    def write(self, rows):
+        """
+        Write a batch of samples
+
+        Keyword arguments:
+            - rows : List of tuples, in the order of COLUMNS
+
+        Return:
+            Nothing
+        """
+
+        self.writer.writerows(rows)
+
+
+    #----------------------------------------------------------------------------
+    def flush(self):
+        """
+        Write the buffered samples to the disk
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.file.flush()
+
+
+    #----------------------------------------------------------------------------
+    def size(self):
+        """
+        Returns the size of the file, including buffered data
+
+        Keyword arguments:
+            None
+
+        Return:
+            Size (bytes)
+        """
+
+        return self.file.tell()
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        """
+        Flush and close the file
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.file.close()
+
+
+
+#=========================================================================================
+#
+# ParquetWriter
+#
+#=========================================================================================
+class ParquetWriter:
+    """
+    Writes samples to a Parquet file. Samples are buffered and written as row groups
+    of rowGroupSize rows, the last one when the file is closed. flush() does not write
+    a row group, to avoid files made of many tiny row groups.
+
+    size() includes an estimate of the buffered rows, so rotation by size does not
+    wait for a full row group.
+    """
+
+    EXTENSION = "parquet"
+
+    ## Size of a row before the first row group gives the actual one (uncompressed
+    ## doubles, flags and a short device name) ##
+    ROW_SIZE = 8 * len(COLUMNS)
+
+    #----------------------------------------------------------------------------
+    def __init__(self, path, rowGroupSize=65536):
+        """
+        Keyword arguments:
+            - path : Path of the file to create
+            - rowGroupSize : Number of rows per row group (default: 65536)
+
+        Raise:
+            ImportError : In case pyarrow is not installed
+        """
+
+        pyarrow = _importPyarrow()
+
+        self.pyarrow = pyarrow
+
+        fields = [pyarrow.field("timestamp", pyarrow.float64()), pyarrow.field("device", pyarrow.string())]
+        for name in Params.FIELDS:
+            kind = pyarrow.bool_() if name in FLAGS else pyarrow.float64()
+            fields.append(pyarrow.field(name, kind))
+
+        self.schema = pyarrow.schema(fields)
+
+        self.path = path
+        self.rowGroupSize = rowGroupSize
+        self.rows = []
+        self.written = 0
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+
+    #----------------------------------------------------------------------------
+    def write(self, rows):
+        self.rows.extend(rows)
+
+        if len(self.rows) >= self.rowGroupSize:
+            self._writeRowGroup()
+
+
+    #----------------------------------------------------------------------------
+    def flush(self):
+        pass
+
+
+    #----------------------------------------------------------------------------
+    def _writeRowGroup(self):
+        """
+        Write the buffered rows as a row group
+        """
+
+        if not self.rows:
+            return
+
+        columns = zip(*self.rows)
+        table = self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(list(c), type=f.type) for c, f in zip(columns, self.schema)],
+            schema=self.schema)
+
+        self.writer.write_table(table)
+        self.written += len(self.rows)
+        self.rows = []
+
+
+    #----------------------------------------------------------------------------
+    def size(self):
+        size = os.path.getsize(self.path)
+
+        if self.rows:
+            rowSize = float(size) / self.written if self.written else self.ROW_SIZE
+            size += int(len(self.rows) * rowSize)
+
+        return size
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        self._writeRowGroup()
+        self.writer.close()
+
+
+#----------------------------------------------------------------------------
+# Writers, indexed by format name
+#----------------------------------------------------------------------------
+WRITERS = {
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+
+#=========================================================================================
+#
+# Logger
+#
+#=========================================================================================
+class Logger:
+    """
+    Polls PSU at a fixed rate and writes the samples to rotated log files
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, output, format="csv", rate=10.0, maxBytes=None, maxSeconds=None,
+                 queueSize=100000, flushInterval=1.0):
+        """
+        Keyword arguments:
+            - output : Base path of the log files. The time the file is created and
+                       the extension are appended (e.g. output-20240101-120000.csv)
+            - format : "csv" or "parquet" (default: "csv")
+            - rate : Number of samples per second, per PSU (default: 10)
+            - maxBytes : Rotate the log file when it reaches this size (default: never)
+            - maxSeconds : Rotate the log file after this time (s, default: never)
+            - queueSize : Maximum number of samples waiting to be written. Samples
+                          are dropped when the queue is full (default: 100000)
+            - flushInterval : Maximum time samples stay in the write buffers of CSV
+                              files (s, default: 1). Parquet row groups are only
+                              written when full or when the file is rotated.
+        """
+
+        if format not in WRITERS:
+            raise ValueError("Unknown format: {0}".format(format))
+
+        if rate <= 0:
+            raise ValueError("The rate must be greater than 0")
+
+        if WRITERS[format] is ParquetWriter:
+            _importPyarrow()
+
+        self.output = output
+        self.writerClass = WRITERS[format]
+        self.period = 1.0 / rate
+        self.maxBytes = maxBytes
+        self.maxSeconds = maxSeconds
+        self.flushInterval = flushInterval
+
+        self.queue = queue.Queue(queueSize)
+        self.ports = []
+        self.threads = []
+        self.stopEvent = threading.Event()
+
+        ## Guards the counters updated by the polling threads ##
+        self.lock = threading.Lock()
+
+        self.samples = 0            # Number of samples written #
+        self.errors = 0             # Number of failed polls #
+        self.missed = 0             # Number of polls skipped because the link was too slow #
+        self.overflows = 0          # Number of samples dropped because the queue was full #
+        self.writeErrors = 0        # Number of failed writes to the log files #
+        self.discarded = 0          # Number of samples lost because of failed writes #
+        self.lastWriteError = None  # Message of the last write error #
+        self.files = []             # Path of the log files created #
+        self.started = None
+        self.stopped = None
+
+        self.writer = None
+        self.opened = None
+
+
+    #----------------------------------------------------------------------------
+    def addPort(self, psu, addresses):
+        """
+        Add a port to poll
+
+        Keyword arguments:
+            - psu : psu364x.Psu object, opened. It must not be used by another thread
+                    while the logger is running.
+            - addresses : Addresses of the PSU to poll on this port
+
+        Return:
+            Nothing
+        """
+
+        self.ports.append((psu, list(addresses)))
+
+
+    #----------------------------------------------------------------------------
+    def dropped(self):
+        """
+        Returns the number of samples lost, either because a poll was skipped, the
+        queue was full or the samples could not be written
+
+        Keyword arguments:
+            None
+
+        Return:
+            Number of samples dropped
+        """
+
+        return self.missed + self.overflows + self.discarded
+
+
+    #----------------------------------------------------------------------------
+    def sampleRate(self):
+        """
+        Returns the achieved sample rate, all PSU included
+
+        Keyword arguments:
+            None
+
+        Return:
+            Samples per second
+        """
+
+        if self.started is None:
+            return 0.0
+
+        elapsed = (self.stopped or time.time()) - self.started
+        if elapsed <= 0:
+            return 0.0
+
+        return (self.samples + self.queue.qsize()) / elapsed
+
+
+    #----------------------------------------------------------------------------
+    def start(self):
+        """
+        Open the first log file, then start the polling threads and the writer thread
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+
+        Raise:
+            IOError : In case the log file can not be created
+        """
+
+        self._rotate(time.time())
+
+        self.started = time.time()
+        self.stopped = None
+        self.stopEvent.clear()
+
+        writer = threading.Thread(target=self._write, name="psu364x-log-writer")
+        pollers = [threading.Thread(target=self._poll, args=port, name="psu364x-log-poller")
+            for port in self.ports]
+
+        self.threads = pollers + [writer]
+
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+
+    #----------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop polling, write the queued samples and close the log file
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.stopped = time.time()
+        self.stopEvent.set()
+
+        for thread in self.threads:
+            thread.join()
+
+        self.threads = []
+
+
+    #----------------------------------------------------------------------------
+    def _poll(self, psu, addresses):
+        """
+        Poll the PSU of a port at the fixed rate
+        """
+
+        deadline = time.time()
+
+        while not self.stopEvent.is_set():
+            for address in addresses:
+                psu.address = address
+                timestamp = time.time()
+
+                try:
+                    params = psu.getParameters()
+                except (UnexpectedResponse, serial.SerialException, socket.error):
+                    params = None
+
+                if params is None:
+                    with self.lock:
+                        self.errors += 1
+                    continue
+
+                row = (timestamp, "{0}@{1}".format(psu.port, address)) + params.toTuple()
+
+                try:
+                    self.queue.put_nowait(row)
+                except queue.Full:
+                    with self.lock:
+                        self.overflows += 1
+
+            deadline += self.period
+            delay = deadline - time.time()
+
+            if delay < 0:
+                ## Skip the polls that could not be done on time ##
+                skipped = int(-delay / self.period)
+                with self.lock:
+                    self.missed += skipped * len(addresses)
+                deadline += skipped * self.period
+                delay += skipped * self.period
+
+            self.stopEvent.wait(delay)
+
+
+    #----------------------------------------------------------------------------
+    def _write(self):
+        """
+        Write the queued samples in batches and rotate the log files
+        """
+
+        lastFlush = time.time()
+
+        while True:
+            rows = []
+
+            try:
+                rows.append(self.queue.get(timeout=self.flushInterval))
+
+                while True:
+                    rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            now = time.time()
+
+            try:
+                if rows:
+                    self._rotate(now)
+                    self.writer.write(rows)
+                    self.samples += len(rows)
+                    rows = []
+
+                if self.writer is not None and now - lastFlush >= self.flushInterval:
+                    self.writer.flush()
+                    lastFlush = now
+
+            except (IOError, OSError) as e:
+                ## e.g. disk full, drop the batch and start a new file on the next one ##
+                self.writeErrors += 1
+                self.discarded += len(rows)
+                self.lastWriteError = str(e)
+                self._discardWriter()
+
+            if self.stopEvent.is_set() and self.queue.empty() and not any(
+                    t.is_alive() for t in self.threads if t is not threading.current_thread()):
+                break
+
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        except (IOError, OSError) as e:
+            self.writeErrors += 1
+            self.lastWriteError = str(e)
+
+        self.writer = None
+
+
+    #----------------------------------------------------------------------------
+    def _discardWriter(self):
+        """
+        Close the current log file after a write error, ignoring further errors
+        """
+
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except (IOError, OSError):
+                pass
+
+        self.writer = None
+
+
+    #----------------------------------------------------------------------------
+    def _rotate(self, now):
+        """
+        Open a new log file if none is opened or if the current one is full or too old
+        """
+
+        if self.writer is not None:
+            if self.maxSeconds is not None and now - self.opened >= self.maxSeconds:
+                pass
+            elif self.maxBytes is not None and self.writer.size() >= self.maxBytes:
+                pass
+            else:
+                return
+
+            self.writer.close()
+
+        path = "{0}-{1}.{2}".format(self.output,
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(now)), self.writerClass.EXTENSION)
+
+        if path in self.files:
+            path = "{0}-{1}.{2}".format(path.rsplit(".", 1)[0], len(self.files), self.writerClass.EXTENSION)
+
+        self.writer = self.writerClass(path)
+        self.opened = now
+        self.files.append(path)
+
+
+
+#=========================================================================================
+def _terminate(signum, frame):
+    """
+    SIGTERM handler, interrupts the main thread like CTRL-C
+    """
+
+    raise KeyboardInterrupt()
+
+
+
+#=========================================================================================
+def main(argv=None):
+    """
+    Entry point of the psu364x-log command
+    """
+
+    parser = argparse.ArgumentParser(description="Log the parameters of Array 364x power supplies")
+    parser.add_argument("devices", metavar="PORT[@ADDRESS]", nargs="+",
+        help="Serial port or tcp://host:port of the PSU, optionally followed by its address")
+    parser.add_argument("-o", "--output", default="psu364x",
+        help="Base path of the log files (default: psu364x)")
+    parser.add_argument("-f", "--format", choices=sorted(WRITERS), default="csv",
+        help="Format of the log files (default: csv)")
+    parser.add_argument("-r", "--rate", type=float, default=10.0,
+        help="Samples per second, per PSU (default: 10)")
+    parser.add_argument("-b", "--baudrate", type=int, default=9600,
+        help="Baud rate (default: 9600)")
+    parser.add_argument("-t", "--duration", type=float, default=None,
+        help="Stop logging after this time in seconds (default: until CTRL-C)")
+    parser.add_argument("--rotate-size", type=float, default=None, metavar="MB",
+        help="Rotate the log file when it reaches this size in MB")
+    parser.add_argument("--rotate-time", type=float, default=None, metavar="SECONDS",
+        help="Rotate the log file after this time in seconds")
+    parser.add_argument("--stats", type=float, default=10.0, metavar="SECONDS",
+        help="Interval between statistics reports, 0 to disable (default: 10)")
+    args = parser.parse_args(argv)
+
+    try:
+        logger = Logger(args.output, args.format, args.rate,
+            maxBytes=int(args.rotate_size * 1048576) if args.rotate_size else None,
+            maxSeconds=args.rotate_time)
+
+        ports = {}
+        for spec in args.devices:
+            port, address = parseDevice(spec)
+            addresses = ports.setdefault(port, [])
+            if (address or 0) not in addresses:
+                addresses.append(address or 0)
+
+        for port, addresses in ports.items():
+            logger.addPort(connect(port, addresses[0], args.baudrate), addresses)
+
+        logger.start()
+
+    except (ValueError, ImportError, IOError, OSError, UnexpectedResponse, serial.SerialException) as e:
+        parser.error(str(e))
+
+    ## SIGTERM (e.g. from a service manager) stops logging like CTRL-C ##
+    signal.signal(signal.SIGTERM, _terminate)
+
+    try:
+        end = None if args.duration is None else time.time() + args.duration
+
+        while end is None or time.time() < end:
+            wait = args.stats if args.stats > 0 else 3600
+            if end is not None:
+                wait = min(wait, max(0, end - time.time()))
+
+            time.sleep(wait)
+
+            if args.stats > 0:
+                sys.stderr.write("samples={0} rate={1:.1f}/s dropped={2} errors={3} write errors={4}\n".format(
+                    logger.samples, logger.sampleRate(), logger.dropped(), logger.errors, logger.writeErrors))
+
+                if logger.lastWriteError is not None:
+                    sys.stderr.write("last write error: {0}\n".format(logger.lastWriteError))
+
+    except KeyboardInterrupt:
+        pass
+
+    ## Let the queued samples be written and the log file closed ##
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    logger.stop()
+
+    ## Closing the transports only, Psu.close() would change the remote control state ##
+    for psu, addresses in logger.ports:
+        psu.sio.close()
+
+    sys.stderr.write("{0} samples written ({1:.1f}/s), {2} dropped, {3} errors, {4} write errors, files: {5}\n".format(
+        logger.samples, logger.sampleRate(), logger.dropped(), logger.errors, logger.writeErrors,
+        ", ".join(logger.files)))
+
+    return 0
+
+
+
+#=========================================================================================
+if __name__ == "__main__":
+    sys.exit(main())
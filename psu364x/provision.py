@@ -0,0 +1,448 @@
+"""
+This module provides declarative provisioning of 364x series PSU
+
+The desired state of many PSU is described in a JSON file :
+
+    {
+        "defaults": {"baudrate": 9600, "remote": true},
+        "targets": [
+            {"port": "/dev/ttyUSB0", "address": 0, "maxVoltage": 12.0, "maxCurrent": 1.5,
+             "maxPower": 18.0, "voltageSet": 5.0, "output": true},
+            {"port": "tcp://rack1:4001", "address": 3, "voltageSet": 3.3}
+        ]
+    }
+
+Each PSU is read once, and only what differs is written : at most one SET frame for
+the parameters (maxVoltage, maxCurrent, maxPower, voltageSet) and one CONTROLSTATE
+frame for the output and remote control state. A second CONTROLSTATE frame is only
+sent when the parameters change while the output is turned on (the output is turned
+on after the SET) or while remote control is disabled (SET requires remote control).
+The ports are processed in parallel, the PSU sharing a port are processed one after
+the other.
+
+    psu364x-provision --verify rack.json
+"""
+
+#=========================================================================================
+import sys
+import json
+import socket
+import argparse
+import threading
+import serial
+
+from psu364x.base import UnexpectedResponse
+from psu364x.cli import connect
+
+
+#----------------------------------------------------------------------------
+# Parameters written with the SET command, with the scale used to encode them
+#----------------------------------------------------------------------------
+PARAMETERS = (
+    ("maxVoltage", 1000),
+    ("maxCurrent", 1000),
+    ("maxPower", 100),
+    ("voltageSet", 1000),
+)
+
+KEYS = set(["port", "address", "baudrate", "output", "remote"]) | set(name for name, scale in PARAMETERS)
+
+#----------------------------------------------------------------------------
+# Largest encoded value of each parameter, from the size of its field in the SET
+# frame (current and power on 16 bits, voltages on 32 bits)
+#----------------------------------------------------------------------------
+MAXIMUM = {
+    "maxVoltage": 0xFFFFFFFF,
+    "maxCurrent": 0xFFFF,
+    "maxPower": 0xFFFF,
+    "voltageSet": 0xFFFFFFFF,
+}
+
+
+
+#=========================================================================================
+def load(path):
+    """
+    Load the desired state file
+
+    Keyword arguments:
+        - path : Path of the JSON file
+
+    Return:
+        List of targets (dict), with the defaults applied
+
+    Raise:
+        ValueError : In case the file is not valid
+    """
+
+    with open(path) as f:
+        config = json.load(f)
+
+    if isinstance(config, list):
+        config = {"targets": config}
+
+    defaults = config.get("defaults", {})
+    targets = []
+
+    for entry in config.get("targets", []):
+        target = dict(defaults)
+        target.update(entry)
+
+        unknown = set(target) - KEYS
+        if unknown:
+            raise ValueError("Unknown keys in target: {0}".format(", ".join(sorted(unknown))))
+
+        if "port" not in target:
+            raise ValueError("A target has no port")
+
+        target.setdefault("address", 0)
+        target.setdefault("baudrate", 9600)
+
+        validate(target)
+
+        targets.append(target)
+
+    return targets
+
+
+
+#=========================================================================================
+def validate(target):
+    """
+    Check the types and ranges of the values of a target
+
+    Keyword arguments:
+        - target : Desired state (dict), with the defaults applied
+
+    Return:
+        Nothing
+
+    Raise:
+        ValueError : In case a value is not valid
+    """
+
+    device = "{0}@{1}".format(target["port"], target.get("address"))
+
+    def isInteger(value):
+        return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+    if not isinstance(target["port"], basestring):
+        raise ValueError("{0}: port must be a string".format(device))
+
+    if not isInteger(target["address"]) or not 0 <= target["address"] <= 254:
+        raise ValueError("{0}: address must be an integer from 0 to 254".format(device))
+
+    if not isInteger(target["baudrate"]) or target["baudrate"] <= 0:
+        raise ValueError("{0}: baudrate must be a positive integer".format(device))
+
+    for name in ("output", "remote"):
+        if name in target and not isinstance(target[name], bool):
+            raise ValueError("{0}: {1} must be true or false".format(device, name))
+
+    for name, scale in PARAMETERS:
+        if name not in target:
+            continue
+
+        value = target[name]
+        if not isinstance(value, (int, long, float)) or isinstance(value, bool):
+            raise ValueError("{0}: {1} must be a number".format(device, name))
+
+        ## Rounded like Psu.setParameters() encodes it, NaN fails the comparison ##
+        if not 0 <= round(value * scale) <= MAXIMUM[name]:
+            raise ValueError("{0}: {1} must be between 0 and {2}".format(
+                device, name, float(MAXIMUM[name]) / scale))
+
+
+
+#=========================================================================================
+#
+# Result
+#
+#=========================================================================================
+class Result:
+    """
+    Holds the outcome of the provisioning of one PSU
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, target):
+        self.target = target
+        self.device = "{0}@{1}".format(target["port"], target["address"])
+
+        self.changes = []           # (name, current value, desired value) #
+        self.frames = 0             # Number of command frames sent #
+        self.mismatches = []        # (name, read back value, desired value) #
+        self.error = None           # Error message, None if successful #
+
+
+    #----------------------------------------------------------------------------
+    def isSuccessful(self):
+        """
+        Check if the PSU was provisioned (and verified) successfully
+
+        Keyword arguments:
+            None
+
+        Return:
+            True if successful, False otherwise
+        """
+
+        return self.error is None and not self.mismatches
+
+
+    #----------------------------------------------------------------------------
+    def __str__(self):
+        """
+        Returns the string representation of the this class
+
+        Keyword arguments:
+            None
+
+        Return:
+            String representation of the class
+        """
+
+        if self.error is not None:
+            status = "ERROR: {0}".format(self.error)
+        elif self.mismatches:
+            status = "VERIFY FAILED: " + ", ".join(
+                "{0}={1} (expected {2})".format(*m) for m in self.mismatches)
+        elif self.changes:
+            status = "CHANGED: " + ", ".join(
+                "{0} {1} -> {2}".format(*c) for c in self.changes)
+        else:
+            status = "UNCHANGED"
+
+        return "{0}: {1} ({2} frames)".format(self.device, status, self.frames)
+
+
+
+#=========================================================================================
+def diff(params, target):
+    """
+    Compare the parameters read from a PSU with the desired state
+
+    Keyword arguments:
+        - params : psu364x.Params object read from the PSU
+        - target : Desired state (dict)
+
+    Return:
+        List of (name, current value, desired value) for the parameters that
+        differ, compared at the resolution of the PSU
+    """
+
+    changes = []
+
+    for name, scale in PARAMETERS:
+        ## Rounded like Psu.setParameters() encodes them ##
+        if name in target and int(round(getattr(params, name) * scale)) != int(round(target[name] * scale)):
+            changes.append((name, getattr(params, name), target[name]))
+
+    if "output" in target and bool(target["output"]) != params.outputState:
+        changes.append(("output", params.outputState, bool(target["output"])))
+
+    return changes
+
+
+
+#=========================================================================================
+def provision(psu, target, verify=False, dryRun=False):
+    """
+    Bring a PSU to the desired state
+
+    Keyword arguments:
+        - psu : psu364x.Psu object, opened, with the address of the target
+        - target : Desired state (dict)
+        - verify : If True, read the parameters back and compare them with the
+                   desired state (default: False)
+        - dryRun : If True, only compute the changes (default: False)
+
+    Return:
+        psu364x.provision.Result object
+    """
+
+    result = Result(target)
+
+    params = psu.getParameters()
+    result.frames += 1
+    if params is None:
+        result.error = "Unable to read the parameters"
+        return result
+
+    result.changes = diff(params, target)
+    if dryRun:
+        return result
+
+    names = set(c[0] for c in result.changes)
+    parameters = [name for name, scale in PARAMETERS if name in names]
+
+    output = bool(target.get("output", params.outputState))
+    remote = bool(target.get("remote", True))
+
+    for name in parameters:
+        setattr(params, name, target[name])
+
+    ## Frames to send : (method, arguments, error message) ##
+    setState = (psu.setControlState, (remote, output), "Unable to set the control state")
+    frames = []
+
+    if parameters:
+        ## The SET command requires remote control. The output is only turned on once
+        ## the new parameters are applied, and local control is restored last ##
+        frames.append((psu.setControlState, (True, output and params.outputState),
+            "Unable to enable remote control"))
+        frames.append((psu.setParameters, (params,), "Unable to set the parameters"))
+
+        if not remote or (output and not params.outputState):
+            frames.append(setState)
+
+    elif "output" in names or "remote" in target:
+        ## The remote control state can not be read, it is sent whenever it is given ##
+        frames.append(setState)
+
+    for method, arguments, message in frames:
+        result.frames += 1
+
+        if not method(*arguments):
+            result.error = message
+            return result
+
+    if verify:
+        result.frames += 1
+        readback = psu.getParameters()
+        if readback is None:
+            result.error = "Unable to read back the parameters"
+            return result
+
+        result.mismatches = diff(readback, target)
+
+    return result
+
+
+
+#=========================================================================================
+def provisionPort(port, targets, verify=False, dryRun=False, debug=False):
+    """
+    Provision the PSU sharing a port, one after the other
+
+    Keyword arguments:
+        - port : Serial port or "tcp://host:port"
+        - targets : Desired state of the PSU on this port (list of dict)
+        - verify : If True, read the parameters back after provisioning
+        - dryRun : If True, only compute the changes
+        - debug : If True, print command and response frame data
+
+    Return:
+        List of psu364x.provision.Result objects
+    """
+
+    results = []
+
+    try:
+        psu = connect(port, targets[0]["address"], targets[0]["baudrate"], debug, identify=False)
+    except Exception as e:
+        for target in targets:
+            result = Result(target)
+            result.error = str(e)
+            results.append(result)
+
+        return results
+
+    try:
+        for target in targets:
+            psu.address = target["address"]
+            psu.remote = False
+
+            try:
+                result = provision(psu, target, verify, dryRun)
+            except (UnexpectedResponse, serial.SerialException, socket.error) as e:
+                result = Result(target)
+                result.error = str(e)
+            except Exception as e:
+                ## One faulty target must not abort the others ##
+                result = Result(target)
+                result.error = "{0}: {1}".format(type(e).__name__, str(e))
+
+            results.append(result)
+    finally:
+        ## Closing the transport only, Psu.close() would disable remote control ##
+        psu.sio.close()
+
+    return results
+
+
+
+#=========================================================================================
+def provisionAll(targets, verify=False, dryRun=False, debug=False):
+    """
+    Provision many PSU, each port on its own thread
+
+    Keyword arguments:
+        - targets : Desired state of the PSU (list of dict, see load())
+        - verify : If True, read the parameters back after provisioning
+        - dryRun : If True, only compute the changes
+        - debug : If True, print command and response frame data
+
+    Return:
+        List of psu364x.provision.Result objects, in the order of the targets
+    """
+
+    ports = {}
+    for target in targets:
+        ports.setdefault(target["port"], []).append(target)
+
+    results = {}
+
+    def worker(port, group):
+        for result in provisionPort(port, group, verify, dryRun, debug):
+            results[id(result.target)] = result
+
+    threads = [threading.Thread(target=worker, args=(port, group)) for port, group in ports.items()]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return [results[id(target)] for target in targets]
+
+
+
+#=========================================================================================
+def main(argv=None):
+    """
+    Entry point of the psu364x-provision command
+    """
+
+    parser = argparse.ArgumentParser(description="Provision Array 364x power supplies from a desired state file")
+    parser.add_argument("file", help="Desired state file (JSON)")
+    parser.add_argument("--verify", action="store_true",
+        help="Read the parameters back and compare them with the desired state")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+        help="Only show the changes, do not write anything")
+    parser.add_argument("-d", "--debug", action="store_true",
+        help="Print command and response frame data")
+    args = parser.parse_args(argv)
+
+    try:
+        targets = load(args.file)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+
+    results = provisionAll(targets, args.verify, args.dry_run, args.debug)
+
+    for result in results:
+        print str(result)
+
+    failed = sum(1 for r in results if not r.isSuccessful())
+    print "\n{0} device(s), {1} changed, {2} failed".format(
+        len(results), sum(1 for r in results if r.changes), failed)
+
+    return 1 if failed else 0
+
+
+
+#=========================================================================================
+if __name__ == "__main__":
+    sys.exit(main())
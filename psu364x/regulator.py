@@ -0,0 +1,379 @@
+"""
+This module provides a closed-loop regulation mode for 364x series PSU
+
+The PSU only regulates its own output voltage. Regulator adjusts the voltage set point
+from the measurements read from the PSU, turning it into a software constant current,
+constant power or voltage regulated (e.g. compensating cable losses) source.
+
+Each cycle sends exactly one READ frame and at most one SET frame. The SET frame is
+built from the parameters returned by the READ of the same cycle, instead of calling
+measureCurrent() followed by setVoltage() which costs three frames per cycle.
+"""
+
+#=========================================================================================
+import time
+import math
+import socket
+import serial
+
+from psu364x.base import UnexpectedResponse
+
+
+#=========================================================================================
+#
+# LoopStatistics
+#
+#=========================================================================================
+class LoopStatistics:
+    """
+    Holds the loop period and jitter statistics of a psu364x.regulator.Regulator
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self):
+        self.reset()
+
+
+    #----------------------------------------------------------------------------
+    def reset(self):
+        """
+        Clear the statistics
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.cycles = 0             # Number of cycles completed #
+        self.errors = 0             # Number of cycles where the PSU could not be read or set #
+        self.lastError = None       # Message of the last communication error #
+        self.count = 0              # Number of loop periods measured #
+        self.mean = 0.0             # Mean loop period (s) #
+        self.minimum = None         # Shortest loop period (s) #
+        self.maximum = None         # Longest loop period (s) #
+
+        self._m2 = 0.0
+
+
+    #----------------------------------------------------------------------------
+    def add(self, period):
+        """
+        Add a loop period measurement
+
+        Keyword arguments:
+            - period : Time elapsed between the start of two cycles (s)
+
+        Return:
+            Nothing
+        """
+
+        ## Welford's online algorithm ##
+        self.count += 1
+        delta = period - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (period - self.mean)
+
+        if self.minimum is None or period < self.minimum:
+            self.minimum = period
+
+        if self.maximum is None or period > self.maximum:
+            self.maximum = period
+
+
+    #----------------------------------------------------------------------------
+    def jitter(self):
+        """
+        Returns the standard deviation of the loop period
+
+        Keyword arguments:
+            None
+
+        Return:
+            Jitter (s)
+        """
+
+        if self.count < 2:
+            return 0.0
+
+        return math.sqrt(self._m2 / (self.count - 1))
+
+
+    #----------------------------------------------------------------------------
+    def rate(self):
+        """
+        Returns the achieved loop rate
+
+        Keyword arguments:
+            None
+
+        Return:
+            Loop rate (Hz), 0 if unknown
+        """
+
+        if self.mean <= 0:
+            return 0.0
+
+        return 1.0 / self.mean
+
+
+    #----------------------------------------------------------------------------
+    def __str__(self):
+        """
+        Returns the string representation of the this class
+
+        Keyword arguments:
+            None
+
+        Return:
+            String representation of the class
+        """
+
+        return "cycles={0}, errors={1}, period={2:.6f}s (min={3}, max={4}), jitter={5:.6f}s, rate={6:.1f}Hz".format(
+            self.cycles,
+            self.errors,
+            self.mean,
+            self.minimum,
+            self.maximum,
+            self.jitter(),
+            self.rate())
+
+
+
+#=========================================================================================
+#
+# Regulator
+#
+#=========================================================================================
+class Regulator:
+    """
+    PID regulation of a PSU measurement by adjusting the voltage set point
+    """
+
+    #----------------------------------------------------------------------------
+    # Regulated measurement
+    #----------------------------------------------------------------------------
+    MODE_CURRENT = "measureCurrent"
+    MODE_VOLTAGE = "measureVoltage"
+    MODE_POWER = "measurePower"
+
+
+    #----------------------------------------------------------------------------
+    def __init__(self, psu, target, mode=MODE_CURRENT, kp=1.0, ki=1.0, kd=0.0,
+                 slewRate=None, minVoltage=0.0, maxVoltage=None):
+        """
+        Keyword arguments:
+            - psu : psu364x.Psu object, already opened
+            - target : Value the measurement is regulated to (A, V or W)
+            - mode : Regulated measurement, MODE_CURRENT, MODE_VOLTAGE or MODE_POWER
+                     (default: MODE_CURRENT)
+            - kp : Proportional gain (V per unit of error, default: 1.0)
+            - ki : Integral gain (V per unit of error per second, default: 1.0)
+            - kd : Derivative gain (V.s per unit of error, default: 0.0)
+            - slewRate : Maximum change of the voltage set point (V/s, default: None)
+            - minVoltage : Lowest voltage set point (V, default: 0)
+            - maxVoltage : Highest voltage set point (V). The maxVoltage parameter of
+                           the PSU is always honoured (default: None)
+        """
+
+        if mode not in (self.MODE_CURRENT, self.MODE_VOLTAGE, self.MODE_POWER):
+            raise ValueError("Invalid regulation mode: {0}".format(mode))
+
+        self.psu = psu
+        self.target = target
+        self.mode = mode
+
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.slewRate = slewRate
+        self.minVoltage = minVoltage
+        self.maxVoltage = maxVoltage
+
+        self.statistics = LoopStatistics()
+        self.running = False
+
+        self.reset()
+
+
+    #----------------------------------------------------------------------------
+    def reset(self):
+        """
+        Clear the controller state. The next cycle only reads the PSU to seed the
+        controller, no voltage set point is sent.
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.lastError = None
+        self.previousError = None
+        self.lastTime = None
+        self.voltage = None
+
+
+    #----------------------------------------------------------------------------
+    def step(self):
+        """
+        Run one regulation cycle : read the PSU parameters, compute the new voltage
+        set point and send it when it changed.
+
+        The incremental (velocity) form of the PID is used : each cycle adds a
+        correction to the voltage set point read from the PSU, so the limits applied
+        to the set point never wind up the integral term.
+
+        Keyword arguments:
+            None
+
+        Return:
+            psu364x.Params object sent to the PSU, None if the PSU could not be read
+            or set
+        """
+
+        now = time.time()
+        if self.lastTime is not None:
+            self.statistics.add(now - self.lastTime)
+
+        dt = (now - self.lastTime) if self.lastTime is not None else 0.0
+        self.lastTime = now
+
+        try:
+            params = self.psu.getParameters()
+        except (UnexpectedResponse, serial.SerialException, socket.error) as e:
+            self.statistics.lastError = str(e)
+            params = None
+
+        if params is None:
+            self.statistics.errors += 1
+            return None
+
+        error = self.target - getattr(params, self.mode)
+        self.statistics.cycles += 1
+
+        ## First cycle, there is no time base yet ##
+        if self.lastError is None or dt <= 0:
+            self.lastError = error
+            self.previousError = error
+            return params
+
+        delta = self.kp * (error - self.lastError) + self.ki * error * dt
+        delta += self.kd * (error - 2 * self.lastError + self.previousError) / dt
+
+        self.previousError = self.lastError
+        self.lastError = error
+
+        ## Keep the fraction of mV the PSU can not represent, unless the voltage set
+        ## point was changed by someone else ##
+        voltage = params.voltageSet
+        if self.voltage is not None and int(round(self.voltage * 1000)) == int(round(voltage * 1000)):
+            voltage = self.voltage
+
+        voltage += delta
+
+        ## Rate limiting ##
+        if self.slewRate is not None:
+            step = self.slewRate * dt
+            voltage = max(params.voltageSet - step, min(params.voltageSet + step, voltage))
+
+        ## Hard bounds : while the PSU limits the current or power, the output is below
+        ## the set point. Pull the set point back to the output voltage so the output
+        ## does not jump when the load changes ##
+        limiting = params.excessiveCurrent or params.excessivePower
+        limiting = limiting or params.measureCurrent >= params.maxCurrent
+        limiting = limiting or params.measurePower >= params.maxPower
+
+        if limiting:
+            voltage = min(voltage, params.voltageSet, params.measureVoltage)
+
+        upper = params.maxVoltage
+        if self.maxVoltage is not None:
+            upper = min(upper, self.maxVoltage)
+
+        voltage = max(self.minVoltage, min(upper, voltage))
+        self.voltage = voltage
+
+        ## The PSU voltage set point resolution is 1 mV ##
+        if int(round(voltage * 1000)) == int(round(params.voltageSet * 1000)):
+            return params
+
+        params.voltageSet = voltage
+
+        try:
+            success = self.psu.setParameters(params)
+        except (UnexpectedResponse, serial.SerialException, socket.error) as e:
+            self.statistics.lastError = str(e)
+            success = False
+
+        if not success:
+            self.statistics.errors += 1
+            return None
+
+        return params
+
+
+    #----------------------------------------------------------------------------
+    def run(self, period=None, cycles=None, duration=None):
+        """
+        Run the regulation loop until stop() is called or until the given number of
+        cycles or duration is reached. Remote control is enabled on the PSU if needed.
+
+        Keyword arguments:
+            - period : Loop period (s). When None, the loop runs as fast as the link
+                       allows (default: None)
+            - cycles : Number of cycles to run (default: unlimited)
+            - duration : Time to run (s, default: unlimited)
+
+        Return:
+            psu364x.regulator.LoopStatistics object
+        """
+
+        if not self.psu.remote:
+            self.psu.enableRemoteControl()
+
+        self.running = True
+        start = time.time()
+        deadline = start
+        count = 0
+
+        while self.running:
+            if cycles is not None and count >= cycles:
+                break
+
+            if duration is not None and time.time() - start >= duration:
+                break
+
+            self.step()
+            count += 1
+
+            if period is not None:
+                deadline += period
+                delay = deadline - time.time()
+
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    ## Overrun, restart the schedule from now ##
+                    deadline = time.time()
+
+        self.running = False
+
+        return self.statistics
+
+
+    #----------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop the regulation loop started with run()
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        self.running = False
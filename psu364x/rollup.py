@@ -0,0 +1,421 @@
+"""
+This module provides incremental multi-resolution rollups of the measurements read
+from 364x series PSU
+
+Samples (psu364x.Params objects returned by getParameters()) are folded into fixed
+time windows (e.g. 1 second, 1 minute and 1 hour) as they arrive. Only the running
+count, sum, minimum and maximum of each measurement are kept for the open windows,
+so memory does not grow with the sampling rate. Finished windows are handed to a
+sink, e.g. MemorySink which keeps a bounded history that can be queried.
+"""
+
+#=========================================================================================
+import time
+import random
+import collections
+
+
+#----------------------------------------------------------------------------
+# Measurements aggregated from each psu364x.Params sample
+#----------------------------------------------------------------------------
+METRICS = ("measureVoltage", "measureCurrent", "measurePower")
+
+
+
+#=========================================================================================
+#
+# Aggregate
+#
+#=========================================================================================
+class Aggregate:
+    """
+    Running statistics (count, sum, min, max) of a single measurement within a window.
+
+    When reservoirSize is greater than 0, a fixed size random sample of the values is
+    also kept, which is used to compute approximate percentiles.
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, reservoirSize=0):
+        """
+        Keyword arguments:
+            - reservoirSize : Number of values kept for approximate percentiles
+                              (0 to disable, default: 0)
+        """
+
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+        self.reservoirSize = reservoirSize
+        self.reservoir = []
+
+
+    #----------------------------------------------------------------------------
+    def add(self, value):
+        """
+        Add a value to the aggregate
+
+        Keyword arguments:
+            - value : Value to add
+
+        Return:
+            Nothing
+        """
+
+        self.count += 1
+        self.total += value
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        if self.reservoirSize > 0:
+            ## Reservoir sampling, every value has the same probability to be kept ##
+            if len(self.reservoir) < self.reservoirSize:
+                self.reservoir.append(value)
+            else:
+                index = random.randint(0, self.count - 1)
+                if index < self.reservoirSize:
+                    self.reservoir[index] = value
+
+
+    #----------------------------------------------------------------------------
+    def mean(self):
+        """
+        Returns the mean of the values added to the aggregate
+
+        Keyword arguments:
+            None
+
+        Return:
+            Mean value, None if the aggregate is empty
+        """
+
+        if self.count == 0:
+            return None
+
+        return self.total / self.count
+
+
+    #----------------------------------------------------------------------------
+    def percentile(self, p):
+        """
+        Returns the approximate percentile of the values added to the aggregate
+
+        Keyword arguments:
+            - p : Percentile (0-100)
+
+        Return:
+            Approximate percentile, None if the aggregate is empty or percentiles
+            are disabled
+
+        Raise:
+            ValueError : In case the percentile is out of range
+        """
+
+        if p < 0 or p > 100:
+            raise ValueError("The percentile must be between 0 and 100")
+
+        if not self.reservoir:
+            return None
+
+        values = sorted(self.reservoir)
+
+        return values[int(round((len(values) - 1) * p / 100.0))]
+
+
+
+#=========================================================================================
+#
+# Window
+#
+#=========================================================================================
+class Window:
+    """
+    Holds the aggregates of the measurements of one device for one time window
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, device, resolution, start, reservoirSize=0):
+        """
+        Keyword arguments:
+            - device : Device key the samples belong to
+            - resolution : Length of the window (seconds)
+            - start : Start time of the window (seconds since epoch)
+            - reservoirSize : Number of values kept for approximate percentiles
+        """
+
+        self.device = device
+        self.resolution = resolution
+        self.start = start
+        self.end = start + resolution
+
+        self.aggregates = dict((name, Aggregate(reservoirSize)) for name in METRICS)
+
+
+    #----------------------------------------------------------------------------
+    def add(self, params):
+        """
+        Add a sample to the window
+
+        Keyword arguments:
+            - params : psu364x.Params object containing the measurements
+
+        Return:
+            Nothing
+        """
+
+        for name in METRICS:
+            self.aggregates[name].add(getattr(params, name))
+
+
+    #----------------------------------------------------------------------------
+    def __str__(self):
+        """
+        Returns the string representation of the this class
+
+        Keyword arguments:
+            None
+
+        Return:
+            String representation of the class
+        """
+
+        return "device={0}, resolution={1}s, start={2}, samples={3}, {4}".format(
+            self.device,
+            self.resolution,
+            self.start,
+            self.aggregates[METRICS[0]].count,
+            ", ".join("{0}=[min={1}, max={2}, mean={3}]".format(
+                name,
+                self.aggregates[name].minimum,
+                self.aggregates[name].maximum,
+                self.aggregates[name].mean()) for name in METRICS))
+
+
+
+#=========================================================================================
+#
+# Rollup
+#
+#=========================================================================================
+class Rollup:
+    """
+    Incrementally aggregates samples into windows of multiple resolutions and flush
+    the finished windows to a sink
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, resolutions=(1, 60, 3600), sink=None, reservoirSize=0):
+        """
+        Keyword arguments:
+            - resolutions : Length of the windows (seconds) (default: 1s, 1 min, 1 h)
+            - sink : Callable receiving each finished psu364x.rollup.Window object
+            - reservoirSize : Number of values kept per window and measurement for
+                              approximate percentiles (0 to disable, default: 0)
+        """
+
+        if not resolutions or any(r <= 0 for r in resolutions):
+            raise ValueError("The resolutions must be greater than 0")
+
+        self.resolutions = tuple(sorted(resolutions))
+        self.sink = sink
+        self.reservoirSize = reservoirSize
+
+        ## Open windows, indexed by (device, resolution) ##
+        self.windows = {}
+
+        ## End of the last window emitted, indexed by (device, resolution) ##
+        self.emitted = {}
+
+        self.late = 0           # Number of samples dropped from at least one resolution because their window was already emitted #
+
+
+    #----------------------------------------------------------------------------
+    def add(self, device, params, timestamp=None):
+        """
+        Add a sample to the open windows of a device. Windows that ended before the
+        sample timestamp are flushed to the sink first. At each resolution, a sample
+        older than the open window, or belonging to a window already emitted, is
+        dropped. Such samples are counted in the late attribute.
+
+        Keyword arguments:
+            - device : Device key (any hashable value, e.g. (port, address))
+            - params : psu364x.Params object containing the measurements
+            - timestamp : Time of the sample (seconds since epoch, default: now)
+
+        Return:
+            Nothing
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        late = False
+
+        for resolution in self.resolutions:
+            window = self.windows.get((device, resolution))
+
+            ## Windows never go back in time, checked for each resolution so an old
+            ## coarse window does not discard the samples of the finer ones ##
+            if (window is not None and timestamp < window.start) or \
+                    timestamp < self.emitted.get((device, resolution), timestamp):
+                late = True
+                continue
+
+            if window is None or timestamp >= window.end:
+                if window is not None:
+                    self._emit(window)
+
+                start = timestamp - (timestamp % resolution)
+                window = Window(device, resolution, start, self.reservoirSize)
+                self.windows[(device, resolution)] = window
+
+            window.add(params)
+
+        if late:
+            self.late += 1
+
+
+    #----------------------------------------------------------------------------
+    def getWindow(self, device, resolution):
+        """
+        Returns the open window of a device
+
+        Keyword arguments:
+            - device : Device key
+            - resolution : Length of the window (seconds)
+
+        Return:
+            psu364x.rollup.Window object, None if no sample was added yet
+        """
+
+        return self.windows.get((device, resolution))
+
+
+    #----------------------------------------------------------------------------
+    def expire(self, timestamp=None):
+        """
+        Flush the open windows that ended before the given time to the sink. Useful
+        when a device stops sending samples.
+
+        Keyword arguments:
+            - timestamp : Current time (seconds since epoch, default: now)
+
+        Return:
+            Nothing
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        for key, window in list(self.windows.items()):
+            if timestamp >= window.end:
+                del self.windows[key]
+                self._emit(window)
+
+
+    #----------------------------------------------------------------------------
+    def flush(self):
+        """
+        Flush all the open windows to the sink, whether they are finished or not.
+        Intended for shutdown : the flushed windows are never re-opened, so samples
+        added afterwards are dropped at each resolution until its flushed window
+        ends (up to an hour for a 1 h resolution). Use expire() to flush finished
+        windows while still adding samples.
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        windows = sorted(self.windows.values(), key=lambda w: (w.resolution, w.start))
+        self.windows = {}
+
+        for window in windows:
+            self._emit(window)
+
+
+    #----------------------------------------------------------------------------
+    def _emit(self, window):
+        """
+        Hand a finished window to the sink
+        """
+
+        key = (window.device, window.resolution)
+        self.emitted[key] = max(window.end, self.emitted.get(key, window.end))
+
+        if self.sink is not None:
+            self.sink(window)
+
+
+
+#=========================================================================================
+#
+# MemorySink
+#
+#=========================================================================================
+class MemorySink:
+    """
+    Keeps a bounded history of the finished windows, which can be used as the sink
+    of a psu364x.rollup.Rollup object
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, retention=1000):
+        """
+        Keyword arguments:
+            - retention : Number of windows kept per device and resolution
+                          (default: 1000)
+        """
+
+        self.retention = retention
+        self.history = {}
+
+
+    #----------------------------------------------------------------------------
+    def __call__(self, window):
+        """
+        Store a finished window, discarding the oldest one when the retention is
+        reached
+
+        Keyword arguments:
+            - window : psu364x.rollup.Window object
+
+        Return:
+            Nothing
+        """
+
+        key = (window.device, window.resolution)
+
+        if key not in self.history:
+            self.history[key] = collections.deque(maxlen=self.retention)
+
+        self.history[key].append(window)
+
+
+    #----------------------------------------------------------------------------
+    def query(self, device, resolution, start=None, end=None):
+        """
+        Returns the stored windows of a device
+
+        Keyword arguments:
+            - device : Device key
+            - resolution : Length of the windows (seconds)
+            - start : Only windows starting at or after this time (default: all)
+            - end : Only windows ending at or before this time (default: all)
+
+        Return:
+            List of psu364x.rollup.Window objects, oldest first
+        """
+
+        windows = self.history.get((device, resolution), ())
+
+        return [w for w in windows
+            if (start is None or w.start >= start) and (end is None or w.end <= end)]
@@ -0,0 +1,418 @@
+"""
+This module provides the transports used by psu364x.Psu to exchange frames with the PSU
+
+    - SerialTransport : Local serial port (default)
+    - TcpTransport : Raw TCP socket, e.g. a serial device server (ser2net) bridging the
+                     serial port of the PSU
+    - LoopbackTransport : In-process transport, frames are handed to a callable
+                          emulating the PSU
+
+All transports implement the subset of the serial.Serial interface used by psu364x.Psu
+(open, close, isOpen, write, flush, read and flushInput).
+"""
+
+#=========================================================================================
+import time
+import socket
+import serial
+
+
+#----------------------------------------------------------------------------
+# Prefix of the port names handled by TcpTransport (e.g. tcp://host:4001)
+#----------------------------------------------------------------------------
+TCP_PREFIX = "tcp://"
+
+
+
+#=========================================================================================
+def createTransport(port=None, timeout=2):
+    """
+    Create the transport matching a port name
+
+    Keyword arguments:
+        - port : "tcp://host:port" for a TCP bridge, serial port otherwise
+        - timeout : Read timeout in seconds (default: 2)
+
+    Return:
+        psu364x.transport.Transport object
+    """
+
+    if port is not None and str(port).startswith(TCP_PREFIX):
+        return TcpTransport(timeout=timeout)
+
+    return SerialTransport(timeout=timeout)
+
+
+
+#=========================================================================================
+#
+# Transport
+#
+#=========================================================================================
+class Transport:
+    """
+    Base class of the transports. The port and baudrate attributes are set by
+    psu364x.Psu before calling open()
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, timeout=2):
+        """
+        Keyword arguments:
+            - timeout : Read timeout in seconds (default: 2)
+        """
+
+        self.port = None
+        self.baudrate = None
+        self.timeout = timeout
+
+
+    #----------------------------------------------------------------------------
+    def open(self):
+        """
+        Open the transport
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        raise NotImplementedError()
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        """
+        Close the transport
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        raise NotImplementedError()
+
+
+    #----------------------------------------------------------------------------
+    def isOpen(self):
+        """
+        Check if the transport is opened
+
+        Keyword arguments:
+            None
+
+        Return:
+            True if opened, False otherwise
+        """
+
+        raise NotImplementedError()
+
+
+    #----------------------------------------------------------------------------
+    def write(self, data):
+        """
+        Write data to the transport
+
+        Keyword arguments:
+            - data : Data to write
+
+        Return:
+            Nothing
+        """
+
+        raise NotImplementedError()
+
+
+    #----------------------------------------------------------------------------
+    def flush(self):
+        """
+        Wait until all the data written is sent
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        pass
+
+
+    #----------------------------------------------------------------------------
+    def read(self, size):
+        """
+        Read data from the transport, until size bytes are received or the timeout
+        expires
+
+        Keyword arguments:
+            - size : Number of bytes to read
+
+        Return:
+            Data received, may be shorter than size if the timeout expired
+        """
+
+        raise NotImplementedError()
+
+
+    #----------------------------------------------------------------------------
+    def flushInput(self):
+        """
+        Discard the data received but not read yet
+
+        Keyword arguments:
+            None
+
+        Return:
+            Nothing
+        """
+
+        pass
+
+
+
+#=========================================================================================
+#
+# SerialTransport
+#
+#=========================================================================================
+class SerialTransport(Transport):
+    """
+    Local serial port transport
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, timeout=2):
+        Transport.__init__(self, timeout)
+
+        self.sio = serial.Serial(timeout=timeout)
+
+
+    #----------------------------------------------------------------------------
+    def open(self):
+        self.sio.port = self.port
+        self.sio.baudrate = self.baudrate
+
+        self.sio.open()
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        self.sio.close()
+
+
+    #----------------------------------------------------------------------------
+    def isOpen(self):
+        return self.sio.isOpen()
+
+
+    #----------------------------------------------------------------------------
+    def write(self, data):
+        self.sio.write(data)
+
+
+    #----------------------------------------------------------------------------
+    def flush(self):
+        self.sio.flush()
+
+
+    #----------------------------------------------------------------------------
+    def read(self, size):
+        return self.sio.read(size)
+
+
+    #----------------------------------------------------------------------------
+    def flushInput(self):
+        self.sio.flushInput()
+
+
+
+#=========================================================================================
+#
+# TcpTransport
+#
+#=========================================================================================
+class TcpTransport(Transport):
+    """
+    Raw TCP socket transport, for serial device servers bridging the serial port of
+    the PSU. The port is either "tcp://host:port", "host:port" or a (host, port) tuple.
+    IPv6 addresses are written between brackets (e.g. tcp://[::1]:4001).
+    The baudrate is configured on the device server and is ignored.
+
+    Nagle's algorithm is disabled so each command frame is sent immediately.
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, timeout=2):
+        Transport.__init__(self, timeout)
+
+        self.sock = None
+
+
+    #----------------------------------------------------------------------------
+    def open(self):
+        """
+        Connect to the device server
+
+        Raise:
+            SerialException : In case the port is invalid or the connection failed
+        """
+
+        address = self.port
+
+        if not isinstance(address, tuple):
+            address = str(address)
+            if address.startswith(TCP_PREFIX):
+                address = address[len(TCP_PREFIX):]
+
+            host, sep, port = address.rpartition(":")
+            if not sep or not port.isdigit():
+                raise serial.SerialException("Invalid TCP port: {0}".format(self.port))
+
+            ## IPv6 literals are written between brackets, e.g. [::1]:4001 ##
+            if host.startswith("[") and host.endswith("]"):
+                host = host[1:-1]
+
+            address = (host, int(port))
+
+        try:
+            self.sock = socket.create_connection(address, self.timeout)
+        except socket.error as e:
+            raise serial.SerialException("Could not connect to {0}:{1} ({2})".format(
+                address[0], address[1], str(e)))
+
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+    #----------------------------------------------------------------------------
+    def isOpen(self):
+        return self.sock is not None
+
+
+    #----------------------------------------------------------------------------
+    def write(self, data):
+        try:
+            self.sock.sendall(data)
+        except socket.error as e:
+            raise serial.SerialException("Write failed ({0})".format(str(e)))
+
+
+    #----------------------------------------------------------------------------
+    def read(self, size):
+        """
+        Read exactly size bytes, unless the timeout expires first
+        """
+
+        deadline = time.time() + self.timeout
+        chunks = []
+        received = 0
+
+        while received < size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            self.sock.settimeout(remaining)
+
+            try:
+                chunk = self.sock.recv(size - received)
+            except socket.timeout:
+                break
+            except socket.error as e:
+                raise serial.SerialException("Read failed ({0})".format(str(e)))
+
+            if not chunk:
+                ## Connection closed by the device server ##
+                break
+
+            chunks.append(chunk)
+            received += len(chunk)
+
+        return "".join(chunks)
+
+
+    #----------------------------------------------------------------------------
+    def flushInput(self):
+        self.sock.setblocking(0)
+
+        try:
+            while self.sock.recv(4096):
+                pass
+        except socket.error:
+            pass
+        finally:
+            self.sock.settimeout(self.timeout)
+
+
+
+#=========================================================================================
+#
+# LoopbackTransport
+#
+#=========================================================================================
+class LoopbackTransport(Transport):
+    """
+    In-process transport. Each frame written is passed to the handler, a callable
+    emulating the PSU, and the frame it returns is queued as the response.
+    """
+
+    #----------------------------------------------------------------------------
+    def __init__(self, handler, timeout=2):
+        """
+        Keyword arguments:
+            - handler : Callable receiving the command frame and returning the
+                        response frame (or None for no response)
+            - timeout : Unused, kept for interface compatibility
+        """
+
+        Transport.__init__(self, timeout)
+
+        self.handler = handler
+        self.buffer = ""
+        self.opened = False
+
+
+    #----------------------------------------------------------------------------
+    def open(self):
+        self.opened = True
+
+
+    #----------------------------------------------------------------------------
+    def close(self):
+        self.opened = False
+
+
+    #----------------------------------------------------------------------------
+    def isOpen(self):
+        return self.opened
+
+
+    #----------------------------------------------------------------------------
+    def write(self, data):
+        response = self.handler(data)
+
+        if response is not None:
+            self.buffer += response
+
+
+    #----------------------------------------------------------------------------
+    def read(self, size):
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+
+        return data
+
+
+    #----------------------------------------------------------------------------
+    def flushInput(self):
+        self.buffer = ""
@@ -11,7 +11,15 @@ config = {
     'author_email': 'benoit@frigon.info',
     'version': '0.1',
     'install_requires': ['pyserial'],
+    'extras_require': {'parquet': ['pyarrow']},
     'packages': ['psu364x'],
+    'entry_points': {
+        'console_scripts': [
+            'psu364x-exporter = psu364x.exporter:main',
+            'psu364x-provision = psu364x.provision:main',
+            'psu364x-log = psu364x.logger:main',
+        ],
+    },
     'name': 'psu364x'
 }
 